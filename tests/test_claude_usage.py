@@ -10,46 +10,91 @@ we duplicate the pure functions here for isolated testing. This ensures:
 Run: python3 test_claude_usage.py
 """
 
+import functools
+import json
+import math
 import unittest
 import subprocess
 import os
 import re
+import sys
+import tempfile
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).parent
 TOOL = SCRIPT_DIR.parent / "src" / "claude_usage"
 
+# Compiled once: strip_ansi runs on every integration test's output
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+
+@functools.lru_cache(maxsize=None)
+def char_width(ch):
+    """Terminal columns occupied by one character.
+
+    Wide/fullwidth characters take 2 columns. Nonspacing and enclosing marks
+    (Mn/Me, e.g. combining accents, VS16) and format characters (Cf, e.g.
+    ZWSP, ZWJ) take 0; the soft hyphen is the usual 1-column exception.
+    Box-drawing and block characters are East Asian "Ambiguous" and render
+    as 1 column in Western terminals, which is what the layout assumes.
+    """
+    if ch != '\u00ad' and unicodedata.category(ch) in ('Mn', 'Me', 'Cf'):
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+
+def display_width(line):
+    """Display width of an ANSI-stripped line in terminal columns."""
+    if line.isascii():
+        return len(line)  # Fast path: ASCII is always 1 column per char
+    return sum(map(char_width, line))
+
 
 # ============================================================================
 # DUPLICATED PURE FUNCTIONS (from claude-usage)
 # Keep in sync with the main script - any divergence is a test failure signal
 # ============================================================================
 
+# (divisor, unit) per magnitude tier, indexed by tok_tier(n).
+# Every unit suffix is 5 chars.
+TOK_UNITS = (
+    (1_000, " Ktok"),
+    (1_000_000, " Mtok"),
+    (1_000_000_000, " Gtok"),
+    (1_000_000_000_000, " Ttok"),
+)
+
+# (divisor, template) per tier; each template takes (value, num_width)
+TOK_FORMATS = tuple((divisor, "{:>{}.1f}" + unit) for divisor, unit in TOK_UNITS)
+
+# Formatters specialized for the default width (every caller uses 10):
+# num_width is baked into the format spec and .format is pre-bound
+TOK_FORMATS_W10 = tuple((divisor, f"{{:>{10 - len(unit)}.1f}}{unit}".format)
+                        for divisor, unit in TOK_UNITS)
+
+def tok_tier(n):
+    """Index into TOK_UNITS: <1M -> K, <1G -> M, <1T -> G, else T."""
+    return min(3, max(0, int(math.log10(max(n, 1))) // 3 - 1))
+
 def fmt_tok_fixed(n, width=10):
     """Format token count in exactly `width` chars, right-aligned.
 
     Always uses 1 decimal place and K/M/G/T tok units for consistency.
     """
-    if n >= 1_000_000_000_000:
-        num = f"{n/1_000_000_000_000:.1f}"
-        unit = " Ttok"
-    elif n >= 1_000_000_000:
-        num = f"{n/1_000_000_000:.1f}"
-        unit = " Gtok"
-    elif n >= 1_000_000:
-        num = f"{n/1_000_000:.1f}"
-        unit = " Mtok"
-    else:
-        num = f"{n/1_000:.1f}"
-        unit = " Ktok"
-    num_width = width - len(unit)
-    return f"{num:>{num_width}}{unit}"
+    tier = tok_tier(n)
+    if width == 10:
+        divisor, fmt_fn = TOK_FORMATS_W10[tier]
+        return fmt_fn(n / divisor)
+    # Other widths: single format call with a runtime num_width
+    divisor, template = TOK_FORMATS[tier]
+    return template.format(n / divisor, width - 5)
 
 
 def fmt_cost_fixed(c, width=10):
     """Format cost in exactly `width` chars, right-aligned with USD suffix."""
-    num_width = width - 4  # " USD" is 4 chars
-    return f"{c:>{num_width}.2f} USD"
+    return f"{c:.2f}".rjust(width - 4) + " USD"  # " USD" is 4 chars
 
 
 def fmt_usd(amount):
@@ -69,51 +114,58 @@ PRICING = {
     "sonnet": {"input": 3.0,  "output": 15.0, "cache_write": 3.75,  "cache_read": 0.30},
     "haiku":  {"input": 0.25, "output": 1.25, "cache_write": 0.30,  "cache_read": 0.03},
 }
+# Interned so keys from get_model_key hit PRICING/MODEL_IDX by identity
+PRICING = {sys.intern(k): v for k, v in PRICING.items()}
+
+# Flattened pricing for the calc_* hot path: one row per model (in
+# MODEL_NAMES order) holding PRICE_COLUMNS, resolved by index instead of
+# nested dict/.get. PRICING stays the source of truth for display.
+MODEL_NAMES = tuple(PRICING)
+PRICE_COLUMNS = ("input", "output", "cache_read", "cache_write")
+PRICING_ROWS = tuple(tuple(PRICING[m][c] for c in PRICE_COLUMNS) for m in MODEL_NAMES)
+MODEL_IDX = {m: i for i, m in enumerate(MODEL_NAMES)}.get
+SONNET_IDX = MODEL_IDX("sonnet")  # Fallback for unknown model keys
 
 
 def calc_cost(model_key, inp, out, cache_read, cache_create):
     """Calculate cost in USD for token usage."""
-    p = PRICING.get(model_key, PRICING["sonnet"])
+    p_in, p_out, p_cr, p_cw = PRICING_ROWS[MODEL_IDX(model_key, SONNET_IDX)]
     return (
-        (inp / 1_000_000) * p["input"] +
-        (out / 1_000_000) * p["output"] +
-        (cache_read / 1_000_000) * p["cache_read"] +
-        (cache_create / 1_000_000) * p["cache_write"]
+        (inp / 1_000_000) * p_in +
+        (out / 1_000_000) * p_out +
+        (cache_read / 1_000_000) * p_cr +
+        (cache_create / 1_000_000) * p_cw
     )
 
 
 def calc_cache_savings(model_key, cache_read):
     """Calculate $ saved by cache hits vs input pricing."""
-    p = PRICING.get(model_key, PRICING["sonnet"])
-    return (cache_read / 1_000_000) * (p["input"] - p["cache_read"])
+    p_in, _, p_cr, _ = PRICING_ROWS[MODEL_IDX(model_key, SONNET_IDX)]
+    return (cache_read / 1_000_000) * (p_in - p_cr)
 
 
+@functools.lru_cache(maxsize=64)
 def get_model_key(model_name):
     """Extract model key for pricing lookup from full model name."""
     name = model_name.lower()
     is_4_5 = "4-5" in name or "4.5" in name
     if "opus" in name:
-        return "opus-4-5" if is_4_5 else "opus"
+        return sys.intern("opus-4-5" if is_4_5 else "opus")
     if "haiku" in name:
-        return "haiku-4-5" if is_4_5 else "haiku"
-    return "sonnet-4-5" if is_4_5 else "sonnet"
+        return sys.intern("haiku-4-5" if is_4_5 else "haiku")
+    return sys.intern("sonnet-4-5" if is_4_5 else "sonnet")
 
 
 class Layout:
     """Layout configuration using anchor points."""
+    # (A2, A3, min trailing) per width tier, indexed by (w >= 80) + (w >= 86)
+    TIERS = ((0, 0, 10), (1, 3, 15), (2, 4, 17))
+
     def __init__(self, w):
         self.w = min(w, 200)
         self.content_w = self.w - 4
 
-        if w >= 86:
-            self.A2 = 2
-            self.A3 = 4
-        elif w >= 80:
-            self.A2 = 1
-            self.A3 = 3
-        else:
-            self.A2 = 0
-            self.A3 = 0
+        self.A2, self.A3, _ = self.TIERS[(w >= 80) + (w >= 86)]
 
         self.A1 = 0
         self.A6 = self.content_w
@@ -174,6 +226,32 @@ class TestFormatters(unittest.TestCase):
             self.assertEqual(len(result), 10, f"Width mismatch for {tokens}: '{result}'")
             self.assertEqual(result, expected, f"Format mismatch for {tokens}")
 
+    def test_fmt_tok_fixed_tier_boundaries(self):
+        """Verify unit switches exactly at 1M/1G/1T (log10 tier selection)."""
+        cases = [
+            (0, "  0.0 Ktok"),
+            (999_900, "999.9 Ktok"),
+            (1_000_000, "  1.0 Mtok"),
+            (999_900_000, "999.9 Mtok"),
+            (1_000_000_000, "  1.0 Gtok"),
+            (999_900_000_000, "999.9 Gtok"),
+            (1_000_000_000_000, "  1.0 Ttok"),
+        ]
+        for tokens, expected in cases:
+            result = fmt_tok_fixed(tokens, 10)
+            self.assertEqual(len(result), 10, f"Width mismatch for {tokens}: '{result}'")
+            self.assertEqual(result, expected, f"Format mismatch for {tokens}")
+
+    def test_fmt_tok_fixed_other_widths(self):
+        """Verify non-default widths (generic path) produce exact width."""
+        for width in (10, 11, 12, 14):
+            for tokens in (500, 89_000, 15_500_000, 1_500_000_000, 1_500_000_000_000):
+                result = fmt_tok_fixed(tokens, width)
+                self.assertEqual(len(result), width, f"Width mismatch for {tokens}@{width}: '{result}'")
+        self.assertEqual(fmt_tok_fixed(309_500_000, 12), "  309.5 Mtok")
+        self.assertEqual(fmt_tok_fixed(309_500_000, 11), " 309.5 Mtok")
+        self.assertEqual(fmt_tok_fixed(500, 8), "0.5 Ktok")
+
     def test_fmt_cost_fixed_width(self):
         """Verify cost formatting produces exact width."""
         cases = [
@@ -198,9 +276,49 @@ class TestFormatters(unittest.TestCase):
         self.assertEqual(fmt_usd(0.01), "0.01 USD")
 
 
+class TestDisplayWidth(unittest.TestCase):
+    """Test display-column measurement used by the overflow checks."""
+
+    def test_box_drawing_is_single_width(self):
+        self.assertEqual(display_width("╭──╮ │ █░"), 9)
+
+    def test_wide_chars_count_double(self):
+        self.assertEqual(display_width("ab漢字"), 6)
+
+    def test_combining_chars_count_zero(self):
+        self.assertEqual(display_width("e\u0301"), 1)
+
+    def test_zero_width_format_chars_count_zero(self):
+        # ZWSP, ZWJ, VS16 and a combining enclosing circle add no columns
+        self.assertEqual(display_width("a\u200bb\u200dc\ufe0fd\u20dd"), 4)
+
+
 class TestCalculations(unittest.TestCase):
     """Test cost calculation functions."""
 
+    # Expected USD for 1M tokens in each category, per model (from the
+    # published pricing table, independent of PRICING)
+    EXPECTED_PER_MTOK = {
+        #              input  output  cache_read  cache_write
+        "opus-4-5":   (5.00,  25.00,  0.50,  6.25),
+        "sonnet-4-5": (3.00,  15.00,  0.30,  3.75),
+        "haiku-4-5":  (1.00,   5.00,  0.10,  1.25),
+        "opus":       (15.00, 75.00,  1.50, 18.75),
+        "sonnet":     (3.00,  15.00,  0.30,  3.75),
+        "haiku":      (0.25,   1.25,  0.03,  0.30),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        # Compute every (model, category) cost once, compared as one vector
+        units = [(1_000_000, 0, 0, 0), (0, 1_000_000, 0, 0), (0, 0, 1_000_000, 0), (0, 0, 0, 1_000_000)]
+        cls.actual = [round(calc_cost(m, *u), 2) for m in cls.EXPECTED_PER_MTOK for u in units]
+        cls.expected = [c for row in cls.EXPECTED_PER_MTOK.values() for c in row]
+
+    def test_calc_cost_pricing_matrix(self):
+        """Verify calc_cost for every model and token category in one comparison."""
+        self.assertEqual(self.actual, self.expected)
+
     def test_calc_cost_opus_input(self):
         """Verify Opus 4.5 input pricing: 1M tokens @ $5/Mtok = $5.00"""
         cost = calc_cost("opus-4-5", 1_000_000, 0, 0, 0)
@@ -226,6 +344,18 @@ class TestCalculations(unittest.TestCase):
         cost = calc_cost("sonnet-4-5", 1_000_000, 1_000_000, 0, 0)
         self.assertAlmostEqual(cost, 3.0 + 15.0, places=2)  # $3 in + $15 out
 
+    def test_calc_cost_unknown_falls_back_to_sonnet(self):
+        """Verify unknown model keys are priced as legacy Sonnet."""
+        cost = calc_cost("unknown", 1_000_000, 1_000_000, 0, 0)
+        self.assertAlmostEqual(cost, calc_cost("sonnet", 1_000_000, 1_000_000, 0, 0), places=6)
+
+    def test_pricing_rows_match_pricing(self):
+        """Verify the flattened pricing table mirrors PRICING row for row."""
+        self.assertEqual(len(PRICING_ROWS), len(PRICING))
+        for model, p in PRICING.items():
+            row = PRICING_ROWS[MODEL_IDX(model)]
+            self.assertEqual(row, tuple(p[c] for c in PRICE_COLUMNS), model)
+
     def test_calc_cache_savings_opus(self):
         """Verify cache savings: 1M reads saves $5.00 - $0.50 = $4.50"""
         savings = calc_cache_savings("opus-4-5", 1_000_000)
@@ -258,6 +388,18 @@ class TestModelKey(unittest.TestCase):
     def test_fallback_to_sonnet(self):
         self.assertEqual(get_model_key("unknown-model"), "sonnet")
 
+    def test_keys_are_interned(self):
+        """Verify returned keys are the same objects as the PRICING keys."""
+        key = get_model_key("claude-haiku-4-5-20250101")
+        self.assertIs(key, MODEL_NAMES[MODEL_IDX(key)])
+
+    def test_memoized(self):
+        """Verify repeat lookups are served from the cache."""
+        get_model_key("claude-opus-4-5-20251101")
+        hits = get_model_key.cache_info().hits
+        self.assertEqual(get_model_key("claude-opus-4-5-20251101"), "opus-4-5")
+        self.assertEqual(get_model_key.cache_info().hits, hits + 1)
+
 
 class TestLayout(unittest.TestCase):
     """Test Layout class calculations."""
@@ -299,22 +441,69 @@ class TestLayout(unittest.TestCase):
 class TestIntegration(unittest.TestCase):
     """Integration tests using subprocess."""
 
-    def run_tool(self, *args, width=80):
-        """Run claude-usage with given args and width."""
+    # Every (args, width) combination used by the tests below
+    INVOCATIONS = [
+        ((), 80),
+        (("hourly",), 80),
+        (("daily",), 80),
+        (("help",), 80),
+        ((), 69),
+        ((), 86),
+    ]
+
+    @classmethod
+    def spawn(cls, args, width, home=None):
+        """Run claude-usage with given args and width (optionally another HOME)."""
         env = os.environ.copy()
         env['COLUMNS'] = str(width)
-        result = subprocess.run(
+        if home is not None:
+            env['HOME'] = str(home)
+        return subprocess.run(
             [str(TOOL)] + list(args),
             capture_output=True,
             text=True,
             env=env,
             timeout=10
         )
-        return result
+
+    @classmethod
+    def setUpClass(cls):
+        # Skip before spawning anything: every run would just fail to exec
+        if not TOOL.exists():
+            raise unittest.SkipTest(f"{TOOL} missing")
+        # Runs are independent, so launch them concurrently and share the
+        # results: wall clock is the slowest run, not the sum of all runs
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = pool.map(lambda inv: cls.spawn(*inv), cls.INVOCATIONS)
+            cls._cache = dict(zip(cls.INVOCATIONS, results))
+
+    def run_tool(self, *args, width=80):
+        """Return the prefetched result for (args, width), running it if new."""
+        key = (args, width)
+        if key not in self._cache:
+            self._cache[key] = self.spawn(args, width)
+        return self._cache[key]
 
     def strip_ansi(self, text):
         """Remove ANSI escape codes."""
-        return re.sub(r'\x1b\[[0-9;]*m', '', text)
+        return _ANSI_RE.sub('', text)
+
+    def assertNoOverflow(self, output, width):
+        """Assert no line of output is wider than width terminal columns.
+
+        Measures display columns rather than code points, so wide (CJK,
+        emoji) characters are counted correctly if they ever appear. The
+        per-line report is only built when something overflows.
+        """
+        lines = output.split('\n')
+        widths = list(map(display_width, lines))
+        if max(widths, default=0) <= width:
+            return
+        overflows = [
+            f"Line {i+1} overflows (width={w}): {line}"
+            for i, (line, w) in enumerate(zip(lines, widths)) if w > width
+        ]
+        self.fail('\n'.join(overflows))
 
     def test_default_runs(self):
         """Verify default command runs without error."""
@@ -342,22 +531,32 @@ class TestIntegration(unittest.TestCase):
     def test_narrow_width_no_overflow(self):
         """Verify no line exceeds width at W=69."""
         result = self.run_tool(width=69)
-        output = self.strip_ansi(result.stdout)
-        for i, line in enumerate(output.split('\n')):
-            self.assertLessEqual(
-                len(line), 69,
-                f"Line {i+1} overflows (len={len(line)}): {line}"
-            )
+        self.assertNoOverflow(self.strip_ansi(result.stdout), 69)
 
     def test_wide_width_no_overflow(self):
         """Verify no line exceeds width at W=86."""
         result = self.run_tool(width=86)
-        output = self.strip_ansi(result.stdout)
-        for i, line in enumerate(output.split('\n')):
-            self.assertLessEqual(
-                len(line), 86,
-                f"Line {i+1} overflows (len={len(line)}): {line}"
-            )
+        self.assertNoOverflow(self.strip_ansi(result.stdout), 86)
+
+    def test_malformed_records_skipped(self):
+        """Verify bad JSONL records are skipped without losing the good ones."""
+        good = {"timestamp": "2026-01-10T10:00:00Z",
+                "message": {"model": "claude-opus-4-5-20251101", "usage": {"input_tokens": 1_000_000}}}
+        records = [
+            good,
+            {"timestamp": "2026-01-10T11:00:00Z", "message": {"model": 123, "usage": {"input_tokens": 5}}},
+            {"timestamp": "2026-01-10T12:00:00Z",
+             "message": {"model": "claude-opus-4-5", "usage": {"input_tokens": 3, "cache_read_input_tokens": "x"}}},
+            good,
+        ]
+        with tempfile.TemporaryDirectory() as home:
+            project = Path(home) / ".claude" / "projects" / "demo"
+            project.mkdir(parents=True)
+            (project / "session.jsonl").write_text(''.join(json.dumps(r) + '\n' for r in records))
+            result = self.spawn(("all",), 80, home=home)
+        self.assertEqual(result.returncode, 0, f"Error: {result.stderr}")
+        # Two good Opus 4.5 records of 1M input tokens each @ $5/Mtok
+        self.assertIn("10.00 USD", self.strip_ansi(result.stdout))
 
     def test_help_shows_usage(self):
         """Verify help command shows usage info."""